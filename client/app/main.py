@@ -1,14 +1,19 @@
-import json
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Optional, List, Union
+from typing import Collection, Dict, Optional, List, Union
+import asyncio
 import os
+import time
 
-from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, Field, create_model
-from pymemcache.client.base import Client
-from starlette.responses import RedirectResponse
+import emcache
+import msgspec
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, create_model
+from starlette.responses import RedirectResponse, Response
 
 description = """
 Ephemeral TODO List, save your todo task as long as the server lives.
@@ -38,16 +43,172 @@ Save all existing data in files. Due to memcached's nature there may be some los
 # ---------------------------------------------------------
 # Memcached
 # ---------------------------------------------------------
-MEMCACHED_IP = (os.environ['MEMCACHED_IP'], 11211)
+MEMCACHED_IP = emcache.MemcachedHostAddress(os.environ['MEMCACHED_IP'], 11211)
 
-memcached_db = Client(MEMCACHED_IP)
+# Connection pool size and autobatching of concurrent gets (0 disables it)
+MEMCACHED_POOL_SIZE = int(os.environ.get('MC_POOL', 16))
+MEMCACHED_BATCH_SIZE = int(os.environ.get('MC_BATCH_SIZE', 0))
 
-task_list_id_set = set()
+# Key holding the ids of every list, shared by all workers
+LIST_INDEX_KEY = b'task-list-index'
 
+# Attempts to add an id to an id index that other requests keep deleting and creating before giving up
+UPDATE_IDS_ATTEMPTS = 8
 
-def delete_tasks(list_id: str, tasks: List[str]):
-    for task_id in tasks:
-        memcached_db.delete(f'task-key_{list_id}_{task_id}')
+
+@lru_cache(maxsize=65536)
+def _list_key(list_id: str) -> bytes:
+    return b'task-list-key_%b' % list_id.encode()
+
+
+@lru_cache(maxsize=65536)
+def _tasks_key(list_id: str) -> bytes:
+    return b'task-list-tasks_%b' % list_id.encode()
+
+
+@lru_cache(maxsize=65536)
+def _task_key(list_id: str, task_id: str) -> bytes:
+    return b'task-key_%b_%b' % (list_id.encode(), task_id.encode())
+
+
+# Id indexes are stored as newline terminated ids, so a new id can be added with memcached's append.
+# Removed ids are appended too, marked as tombstones. Ids are part of memcached keys, which can not
+# contain control characters, so the mark never clashes with a real id.
+# They are loaded as insertion ordered dicts so ids can be removed in constant time.
+_TOMBSTONE = '\x7f'
+
+
+def _load_ids(raw: bytes) -> Dict[str, None]:
+    if _TOMBSTONE.encode() not in raw:
+        return dict.fromkeys(raw.decode().split('\n')[:-1])
+    ids = {}
+    for item_id in raw.decode().split('\n')[:-1]:
+        if item_id.startswith(_TOMBSTONE):
+            ids.pop(item_id[1:], None)
+        else:
+            ids.setdefault(item_id)
+    return ids
+
+
+def _dump_ids(ids: Collection[str]) -> bytes:
+    return ''.join(f'{item_id}\n' for item_id in ids).encode()
+
+
+async def delete_tasks(memcached_db: emcache.Client, list_id: str, tasks: List[str]):
+    # Lists without tasks (the common case) need no round trip at all
+    if not tasks:
+        return
+    # Send every delete at once without waiting for replies (noreply)
+    await asyncio.gather(*(memcached_db.delete(_task_key(list_id, task_id), noreply=True)
+                           for task_id in tasks))
+
+
+async def delete_key(memcached_db: emcache.Client, key: bytes) -> bool:
+    try:
+        await memcached_db.delete(key)
+        return True
+    except emcache.NotFoundCommandError:
+        return False
+
+
+# Short lived in-process cache in front of the read endpoints. Writes from this worker
+# invalidate their keys, writes from other workers show up once the entries expire.
+# Every invalidation bumps the generation so a read that was already in flight when a
+# write landed does not put the value it fetched before that write back into the cache.
+_read_cache = TTLCache(maxsize=4096, ttl=1.0)
+_cache_generation = 0
+
+
+async def cached_get(memcached_db: emcache.Client, key: bytes) -> Optional[emcache.Item]:
+    if (item := _read_cache.get(key)) is None:
+        generation = _cache_generation
+        if (item := await memcached_db.get(key)) and generation == _cache_generation:
+            _read_cache[key] = item
+    return item
+
+
+async def cached_get_many(memcached_db: emcache.Client, keys: List[bytes]) -> Dict[bytes, emcache.Item]:
+    stored_items = {}
+    missing_keys = []
+    for key in keys:
+        if (item := _read_cache.get(key)) is not None:
+            stored_items[key] = item
+        else:
+            missing_keys.append(key)
+    if missing_keys:
+        generation = _cache_generation
+        fetched_items = await memcached_db.get_many(missing_keys)
+        if generation == _cache_generation:
+            _read_cache.update(fetched_items)
+        stored_items.update(fetched_items)
+    return stored_items
+
+
+def invalidate(*keys: bytes):
+    global _cache_generation
+    _cache_generation += 1
+    for key in keys:
+        _read_cache.pop(key, None)
+
+
+async def append_id(memcached_db: emcache.Client, key: bytes, item_id: str):
+    # Appending never conflicts with other requests. If the ids key is missing (evicted or deleted
+    # meanwhile) create it, unless another request created it first, then append to that one.
+    # Duplicated ids are dropped when loading.
+    for _ in range(UPDATE_IDS_ATTEMPTS):
+        try:
+            await memcached_db.append(key, _dump_ids([item_id]))
+            return
+        except emcache.NotStoredStorageCommandError:
+            pass
+        try:
+            await memcached_db.add(key, _dump_ids([item_id]))
+            return
+        except emcache.NotStoredStorageCommandError:
+            pass
+    raise emcache.StorageCommandError(f"Could not update {key.decode()} after {UPDATE_IDS_ATTEMPTS} attempts")
+
+
+async def remove_id(memcached_db: emcache.Client, key: bytes, item_id: str, ids_item: Optional[emcache.Item] = None):
+    # Append a tombstone, so removing never conflicts with other requests either.
+    # If the ids key is missing there is nothing to remove.
+    try:
+        await memcached_db.append(key, _dump_ids([_TOMBSTONE + item_id]))
+    except emcache.NotStoredStorageCommandError:
+        return
+    # Once the ids last read (ids_item) hold more tombstones than live ids rewrite them without those. This
+    # is best effort, if another request modifies them meanwhile a later removal will compact them.
+    if ids_item and ids_item.value.count(_TOMBSTONE.encode()) * 3 > ids_item.value.count(b'\n'):
+        if ids_item := await memcached_db.gets(key):
+            try:
+                await memcached_db.cas(key, _dump_ids(_load_ids(ids_item.value)), ids_item.cas)
+            except emcache.StorageCommandError:
+                pass
+
+
+async def fetch_lists(memcached_db: emcache.Client, list_ids: Collection[str], get_task_data: bool = False,
+                      use_cache: bool = True) -> List['TaskListWithTasks']:
+    # Get every list with its task ids at once and, if requested, every task of those lists at once too
+    if not list_ids:
+        return []
+    get_many = partial(cached_get_many, memcached_db) if use_cache else memcached_db.get_many
+    stored_items = await get_many([key for list_id in list_ids
+                                   for key in (_list_key(list_id), _tasks_key(list_id))])
+    task_lists = []
+    for list_id in list_ids:
+        if list_item := stored_items.get(_list_key(list_id)):
+            task_list = _load_list(list_item.value)
+            tasks_item = stored_items.get(_tasks_key(list_id))
+            task_list.tasks = list(_load_ids(tasks_item.value)) if tasks_item else []
+            task_lists.append(task_list)
+    if get_task_data:
+        task_keys = [_task_key(task_list.list_id, task_id) for task_list in task_lists for task_id in task_list.tasks]
+        tasks_data = await get_many(task_keys) if task_keys else {}
+        for task_list in task_lists:
+            task_list.tasks = [_load_task(tasks_data[task_key].value)
+                               if (task_key := _task_key(task_list.list_id, task_id)) in tasks_data else task_id
+                               for task_id in task_list.tasks]
+    return task_lists
 
 
 # ---------------------------------------------------------
@@ -70,20 +231,30 @@ app = FastAPI(
 
 
 @app.on_event("startup")
-def startup():
-    global memcached_db
-    memcached_db = Client(MEMCACHED_IP)
+async def startup():
+    # Async client pool, reached by every request through app.state
+    app.state.memcached_db = await emcache.create_client(
+        [MEMCACHED_IP],
+        max_connections=MEMCACHED_POOL_SIZE,
+        timeout=1.0,
+        connection_timeout=1.0,
+        autobatching=MEMCACHED_BATCH_SIZE > 0,
+        autobatching_max_keys=MEMCACHED_BATCH_SIZE or emcache.DEFAULT_AUTOBATCHING_MAX_KEYS,
+    )
 
 
 @app.on_event("shutdown")
-def shutdown():
-    memcached_db.close()
+async def shutdown():
+    await app.state.memcached_db.close()
 
 
 # ---------------------------------------------------------
 # Data Classes
 # ---------------------------------------------------------
 
+_now_str = partial(time.strftime, "%d-%b-%Y (%H:%M:%S)")
+
+
 class TaskStatus(str, Enum):
     assigned = 'Assigned'
     in_process = 'In Process'
@@ -105,21 +276,71 @@ class Task(BaseModel):
     due_date: str = None
 
 
-class TaskInDB(Task):
+class TaskList(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+
+# Stored data, kept as msgspec structs. Request bodies are validated by the
+# Pydantic models above, so structs are only built from already validated data.
+class TaskInDB(msgspec.Struct, kw_only=True):
+    name: str
+    description: str
+    status: TaskStatus = TaskStatus.assigned
+    due_date: Optional[str] = None
     task_id: str
     assigned_list: str
-    creation_date: str = Field(default_factory=lambda: datetime.now().strftime("%d-%b-%Y (%H:%M:%S)"))
+    creation_date: str = msgspec.field(default_factory=_now_str)
 
 
-class TaskList(BaseModel):
+class TaskListInDB(msgspec.Struct, kw_only=True):
     name: str
     description: Optional[str] = None
+    list_id: str
+    creation_date: str = msgspec.field(default_factory=_now_str)
+
+
+# A list with its tasks (ids or task data) as returned by the API, task ids are stored on their own key
+class TaskListWithTasks(TaskListInDB, kw_only=True):
+    tasks: List[Union[str, TaskInDB]] = msgspec.field(default_factory=list)
+
+
+# Response schemas, only used for the API documentation. Responses are encoded straight from the
+# structs above, skipping response_model, so keep their fields in sync with TaskInDB and TaskListWithTasks
+class TaskResponse(Task):
+    task_id: str
+    assigned_list: str
+    creation_date: str
 
 
-class TaskListInDB(TaskList):
+class TaskListResponse(TaskList):
     list_id: str
-    creation_date: str = Field(default_factory=lambda: datetime.now().strftime("%d-%b-%Y (%H:%M:%S)"))
-    tasks: List[Union[str, TaskInDB]] = Field(default_factory=list)
+    creation_date: str
+    tasks: List[Union[str, TaskResponse]] = []
+
+
+_json_encoder = msgspec.json.Encoder()
+_task_decoder = msgspec.json.Decoder(TaskInDB)
+_list_decoder = msgspec.json.Decoder(TaskListWithTasks)
+
+
+def _load_task(raw: bytes) -> TaskInDB:
+    return _task_decoder.decode(raw)
+
+
+def _load_list(raw: bytes) -> TaskListWithTasks:
+    return _list_decoder.decode(raw)
+
+
+class MsgspecResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return _json_encoder.encode(content)
+
+
+DeleteListResponse = create_model('DeleteListResponse', message=(str, ...), list_id=(str, ...), deleted_tasks=(List[str], ...))
+DeleteTaskResponse = create_model('DeleteTaskResponse', message=(str, ...), task_id=(str, ...), list_id=(str, ...))
 
 
 # ---------------------------------------------------------
@@ -127,52 +348,82 @@ class TaskListInDB(TaskList):
 # ---------------------------------------------------------
 
 @app.get("/", include_in_schema=False)
-def root():
+async def root():
     return RedirectResponse(url='/docs')
 
 
 # Lists
 # ---------------------------------------------------------
 
-@app.post("/todo_lists/", response_model=TaskListInDB, status_code=status.HTTP_201_CREATED, tags=["Lists"])
-def create_list(data: TaskList):
+@app.post("/todo_lists/", response_model=TaskListResponse, status_code=status.HTTP_201_CREATED, tags=["Lists"])
+async def create_list(request: Request, data: TaskList):
+    memcached_db = request.app.state.memcached_db
     list_id = data.name.replace(' ', '_')
-    if memcached_db.get(f'task-list-key_{list_id}'):
+    data = TaskListInDB(list_id=list_id, **data.__dict__)
+
+    # Create the task ids key before the list, so tasks can be added as soon as the list exists
+    try:
+        await memcached_db.add(_tasks_key(list_id), b'')
+        stale_tasks_key = False
+    except emcache.NotStoredStorageCommandError:
+        stale_tasks_key = True
+
+    try:
+        await memcached_db.add(_list_key(list_id), _json_encoder.encode(data))
+    except emcache.NotStoredStorageCommandError:
         raise HTTPException(status_code=409, detail=f"There's already a list with id {list_id}")
-    data = TaskListInDB(list_id=list_id, **dict(data))
-    memcached_db.set(f'task-list-key_{list_id}', data.json())
-    task_list_id_set.add(list_id)
-    return data
 
+    # Task ids left behind by a previous list with the same id
+    if stale_tasks_key:
+        await memcached_db.set(_tasks_key(list_id), b'')
 
-@app.get("/todo_lists/{list_id}", response_model=TaskListInDB, status_code=status.HTTP_202_ACCEPTED, tags=["Lists"])
-def get_list(list_id: str, get_task_data: Optional[bool] = False):
-    if not (list_data := memcached_db.get(f'task-list-key_{list_id}')):
+    # Add the list to the index, without it the list would never be backed up, so undo it all if that fails
+    try:
+        await append_id(memcached_db, LIST_INDEX_KEY, list_id)
+    except Exception:
+        await asyncio.gather(memcached_db.delete(_list_key(list_id), noreply=True),
+                             memcached_db.delete(_tasks_key(list_id), noreply=True))
+        raise
+    finally:
+        invalidate(_list_key(list_id), _tasks_key(list_id))
+    return MsgspecResponse(TaskListWithTasks(**msgspec.structs.asdict(data)), status_code=status.HTTP_201_CREATED)
+
+
+@app.get("/todo_lists/{list_id}", response_model=TaskListResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Lists"])
+async def get_list(request: Request, list_id: str, get_task_data: Optional[bool] = False):
+    memcached_db = request.app.state.memcached_db
+    if not (task_lists := await fetch_lists(memcached_db, [list_id], get_task_data)):
         raise HTTPException(status_code=404, detail=f"List {list_id} not found")
-    list_data = TaskListInDB(**json.loads(list_data))
-    if get_task_data:
-        for task_indx, task_id in enumerate(list_data.tasks):
-            if task_data := memcached_db.get(f'task-key_{list_id}_{task_id}'):
-                list_data.tasks[task_indx] = TaskInDB(**json.loads(task_data))
-    return list_data
+    return MsgspecResponse(task_lists[0], status_code=status.HTTP_202_ACCEPTED)
 
 
 @app.delete("/todo_lists/{list_id}",
-            response_model=create_model('DeleteListResponse', message=(str, ...), list_id=(str, ...), deleted_tasks=(List[str], ...)),
+            response_model=DeleteListResponse,
             status_code=status.HTTP_200_OK,
             tags=["Lists"])
-def delete_list(list_id: str):
-    # Check if list exists and get list data
-    if not (list_data := memcached_db.get(f'task-list-key_{list_id}')):
+async def delete_list(request: Request, list_id: str):
+    memcached_db = request.app.state.memcached_db
+    list_key = _list_key(list_id)
+    tasks_key = _tasks_key(list_id)
+
+    # Check if list exists and get its task ids, along with the list index to compact it if needed
+    stored_items = await memcached_db.get_many((list_key, tasks_key, LIST_INDEX_KEY))
+    if list_key not in stored_items:
         raise HTTPException(status_code=404, detail=f"List {list_id} not found")
 
-    # Get related tasks and delete them
-    related_tasks = TaskListInDB(**json.loads(list_data)).tasks
-    delete_tasks(list_id, related_tasks)
+    # Get related tasks and delete them along with the list in a single burst
+    related_tasks = list(_load_ids(stored_items[tasks_key].value)) if tasks_key in stored_items else []
+    await asyncio.gather(delete_tasks(memcached_db, list_id, related_tasks),
+                         memcached_db.delete(list_key, noreply=True),
+                         memcached_db.delete(tasks_key, noreply=True))
+    invalidate(list_key, tasks_key, *(_task_key(list_id, task_id) for task_id in related_tasks))
 
-    # Delete the list
-    memcached_db.delete(f'task-list-key_{list_id}')
-    task_list_id_set.remove(list_id)
+    # The list is gone already and lists missing from memcached are skipped when fetching them,
+    # so an id left on the index is harmless and failing to remove it does not fail the request
+    try:
+        await remove_id(memcached_db, LIST_INDEX_KEY, list_id, stored_items.get(LIST_INDEX_KEY))
+    except emcache.StorageCommandError:
+        pass
 
     # Inform
     return {'message': f'{list_id} deleted successfully.',
@@ -183,84 +434,102 @@ def delete_list(list_id: str):
 # Tasks
 # ---------------------------------------------------------
 
-@app.post("/todo_lists/{list_id}", response_model=TaskInDB, status_code=status.HTTP_201_CREATED, tags=["Tasks"])
-def add_task(list_id: str, task_data: Task):
+@app.post("/todo_lists/{list_id}", response_model=TaskResponse, status_code=status.HTTP_201_CREATED, tags=["Tasks"])
+async def add_task(request: Request, list_id: str, task_data: Task):
+    memcached_db = request.app.state.memcached_db
+    task_id = task_data.name.replace(' ', '_')
+    list_key = _list_key(list_id)
+    task_key = _task_key(list_id, task_id)
+
+    # Get list and task in a single round trip
+    stored_items = await memcached_db.get_many((list_key, task_key))
+
     # Check if list exists
-    if not (list_data := memcached_db.get(f'task-list-key_{list_id}')):
+    if list_key not in stored_items:
         raise HTTPException(status_code=404, detail=f"List {list_id} not found")
 
     # Check if task already exists
-    task_id = task_data.name.replace(' ', '_')
-    if memcached_db.get(f'task-key_{list_id}_{task_id}'):
+    if task_key in stored_items:
         raise HTTPException(status_code=409,
                             detail=f"There's already a task with id {task_id} on list {list_id}.\n"
                                    f"Use PUT method instead to edit task data.")
 
-    # Generate task
-    task_data = TaskInDB(task_id=task_id, assigned_list=list_id, **dict(task_data))
-    memcached_db.set(f'task-key_{list_id}_{task_id}', task_data.json())
-
-    # Add task to list data and uodate
-    list_data = TaskListInDB(**json.loads(list_data))
-    list_data.tasks.append(task_id)
-    memcached_db.set(f'task-list-key_{list_id}', list_data.json())
+    # Generate task and append its id to the list's task ids at once
+    task_data = TaskInDB(task_id=task_id, assigned_list=list_id, **task_data.__dict__)
+    await asyncio.gather(memcached_db.set(task_key, _json_encoder.encode(task_data)),
+                         append_id(memcached_db, _tasks_key(list_id), task_id))
+    invalidate(task_key, _tasks_key(list_id))
 
-    return task_data
+    return MsgspecResponse(task_data, status_code=status.HTTP_201_CREATED)
 
 
-@app.put("/todo_lists/{list_id}/{task_id}", response_model=TaskInDB, status_code=status.HTTP_200_OK, tags=["Tasks"])
-def edit_task(list_id: str, task_id: str, updated_task_data: UpdatedTaskData):
+@app.put("/todo_lists/{list_id}/{task_id}", response_model=TaskResponse, status_code=status.HTTP_200_OK, tags=["Tasks"])
+async def edit_task(request: Request, list_id: str, task_id: str, updated_task_data: UpdatedTaskData):
+    memcached_db = request.app.state.memcached_db
     # Check if task exists
-    if not (task_data := memcached_db.get(f'task-key_{list_id}_{task_id}')):
+    if not (task_data := await memcached_db.get(_task_key(list_id, task_id))):
         raise HTTPException(status_code=404, detail=f"Task {task_id} on list {list_id} not found.")
 
-    # Get original data and updated values
-    task_data = json.loads(task_data)
-    updated_task_data = updated_task_data.dict(exclude_unset=True)
-
-    # Update data
-    task_data.update(updated_task_data)
-    task_data = TaskInDB(**task_data)  # Convert to model
-    memcached_db.set(f'task-key_{list_id}_{task_id}', task_data.json())
-    return task_data
-
-
-@app.get("/todo_lists/{list_id}/{task_id}", response_model=TaskInDB, status_code=status.HTTP_200_OK, tags=["Tasks"])
-def get_task(list_id: str, task_id: str):
-    if not (task_data := memcached_db.get(f'task-key_{list_id}_{task_id}')):
+    # Update original data and validate the result, the updated values may be explicit nulls
+    task_data = msgspec.structs.replace(_load_task(task_data.value), **updated_task_data.dict(exclude_unset=True))
+    try:
+        task_data = msgspec.convert(msgspec.to_builtins(task_data), TaskInDB)
+    except msgspec.ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    await memcached_db.set(_task_key(list_id, task_id), _json_encoder.encode(task_data))
+    invalidate(_task_key(list_id, task_id))
+    return MsgspecResponse(task_data, status_code=status.HTTP_200_OK)
+
+
+@app.get("/todo_lists/{list_id}/{task_id}", response_model=TaskResponse, status_code=status.HTTP_200_OK, tags=["Tasks"])
+async def get_task(request: Request, list_id: str, task_id: str):
+    memcached_db = request.app.state.memcached_db
+    if not (task_data := await cached_get(memcached_db, _task_key(list_id, task_id))):
         raise HTTPException(status_code=404, detail=f"Task {task_id} on list {list_id} not found.")
-    return TaskInDB(**json.loads(task_data))
+    return MsgspecResponse(_load_task(task_data.value), status_code=status.HTTP_200_OK)
 
 
 @app.delete("/todo_lists/{list_id}/{task_id}",
-            response_model=create_model('DeleteTaskResponse', message=(str, ...), task_id=(str, ...), list_id=(str, ...)),
+            response_model=DeleteTaskResponse,
             status_code=status.HTTP_200_OK,
             tags=["Tasks"])
-def delete_task(list_id: str, task_id: str):
-    # Check if list exists
-    if not (list_data := memcached_db.get(f'task-list-key_{list_id}')):
+async def delete_task(request: Request, list_id: str, task_id: str):
+    memcached_db = request.app.state.memcached_db
+    list_key = _list_key(list_id)
+    tasks_key = _tasks_key(list_id)
+    task_key = _task_key(list_id, task_id)
+
+    # Check if list exists, getting its task ids in the same round trip
+    stored_items = await memcached_db.get_many((list_key, tasks_key))
+    if list_key not in stored_items:
         raise HTTPException(status_code=404, detail=f"List {list_id} not found")
 
     # Delete and check if task exists
-    if not memcached_db.delete(f'task-key_{list_id}_{task_id}', noreply=False):
+    task_deleted = await delete_key(memcached_db, task_key)
+    invalidate(task_key)
+    if not task_deleted:
         raise HTTPException(status_code=404, detail=f"Task {task_id} on list {list_id} not found.")
 
-    # Delete task to list data and uodate
-    list_data = TaskListInDB(**json.loads(list_data))
-    try:
-        list_data.tasks.remove(task_id)
-        memcached_db.set(f'task-list-key_{list_id}', list_data.json())
-    except ValueError:
-        pass
+    # Delete task from list's task ids
+    await remove_id(memcached_db, tasks_key, task_id, stored_items.get(tasks_key))
+    invalidate(tasks_key)
 
     return {'message': f'Task {task_id} on list {list_id} deleted successfully.',
             'task_id': task_id,
             'list_id': list_id}
 
 
-@app.post("/backup", status_code=status.HTTP_201_CREATED, tags=["Backup"])
-def make_backup():
-    data = [get_list(task_list, get_task_data=True).dict() for task_list in task_list_id_set]
+def write_backup(data: bytes):
     Path('./backup').mkdir(exist_ok=True)
-    with open(f'./backup/backup_data_{datetime.now().strftime("%d-%m-%Y_%H%M%S")}.json', 'w', encoding='utf8') as f:
-        json.dump(data, f, indent=2)
+    with open(f'./backup/backup_data_{datetime.now().strftime("%d-%m-%Y_%H%M%S")}.json', 'wb') as f:
+        f.write(data)
+
+
+@app.post("/backup", status_code=status.HTTP_201_CREATED, tags=["Backup"])
+async def make_backup(request: Request):
+    memcached_db = request.app.state.memcached_db
+    index_item = await memcached_db.get(LIST_INDEX_KEY)
+    task_lists = await fetch_lists(memcached_db, _load_ids(index_item.value) if index_item else {},
+                                   get_task_data=True, use_cache=False)
+    data = msgspec.json.format(_json_encoder.encode(task_lists), indent=2)
+    await run_in_threadpool(write_backup, data)